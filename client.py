@@ -1,16 +1,28 @@
 import socket
 import json
-import select
+import re
+import selectors
 import sys
-import time
 
 
 HOST = "127.0.0.1"
 PORT = 5001
 ENC = "utf-8"
 
-# Per-socket receive buffer (newline-delimited JSON).
-BUFFERS = {}
+# Receive buffer for the single server connection (newline-delimited JSON).
+_RX_BUF = bytearray()
+# _RX_BUF[:_RX_SCAN] is known to contain no newline; searches resume from here.
+_RX_SCAN = 0
+
+# Reusable scratch area for recv_into (one allocation for the program lifetime).
+_SCRATCH = bytearray(4096)
+_SCRATCH_MV = memoryview(_SCRATCH)
+
+# Registered once in main(): the server socket, plus stdin on POSIX.
+SELECTOR = None
+# False when stdin could not be registered (e.g. a regular file: epoll refuses it).
+# Such stdin never blocks, so it is treated as always readable.
+STDIN_IN_SELECTOR = False
 
 
 try:
@@ -19,56 +31,180 @@ try:
 except Exception:
     HAS_MS = False
 
+if HAS_MS:
+    # Win32 waits so the client can sleep on console input + socket together.
+    import ctypes
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _ws2_32 = ctypes.WinDLL("ws2_32", use_last_error=True)
+
+    _kernel32.GetStdHandle.argtypes = [wintypes.DWORD]
+    _kernel32.GetStdHandle.restype = wintypes.HANDLE
+    _kernel32.WaitForMultipleObjects.argtypes = [
+        wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD
+    ]
+    _kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+    _kernel32.FlushConsoleInputBuffer.argtypes = [wintypes.HANDLE]
+    _kernel32.GetConsoleMode.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD)]
+    _kernel32.GetConsoleMode.restype = wintypes.BOOL
+    _ws2_32.WSACreateEvent.restype = wintypes.HANDLE
+    _ws2_32.WSAEventSelect.argtypes = [ctypes.c_size_t, wintypes.HANDLE, ctypes.c_long]
+    _ws2_32.WSACloseEvent.argtypes = [wintypes.HANDLE]
+
+    STD_INPUT_HANDLE = 0xFFFFFFF6  # (DWORD)-10
+    INFINITE = 0xFFFFFFFF
+    WAIT_OBJECT_0 = 0
+    WAIT_FAILED = 0xFFFFFFFF
+    WSA_INVALID_EVENT = None  # NULL handle
+    FD_READ = 0x01
+    FD_CLOSE = 0x20
+
+try:
+    import orjson  # optional, much faster than stdlib json
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+if HAS_ORJSON:
+    def dumps_line(obj):
+        # orjson writes the trailing newline itself: one bytes object, no concat copy.
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+    loads = orjson.loads
+else:
+    def dumps_line(obj):
+        return (json.dumps(obj) + "\n").encode(ENC)
+
+    loads = json.loads  # accepts bytes as well
+
 
 def send_json(conn, obj):
-    conn.sendall((json.dumps(obj) + "\n").encode(ENC))
+    conn.sendall(dumps_line(obj))
 
 
-def recv_line(conn):
-    key = conn.fileno()
-    buf = BUFFERS.get(key, b"")
+# Fixed-shape messages are sent as prebuilt bytes (no JSON encoding);
+# only messages carrying user-supplied strings go through send_json.
+MSG_LEAVE = b'{"type":"LEAVE"}\n'
+MSG_LIST = b'{"type":"LIST"}\n'
+MSG_QUIT = b'{"type":"QUIT"}\n'
+_MOVE_TMPL = b'{"type":"MOVE","row":%d,"col":%d}\n'
 
-    while b"\n" not in buf:
-        chunk = conn.recv(4096)
-        if not chunk:
-            BUFFERS.pop(key, None)
-            return None
-        buf += chunk
 
-    line, rest = buf.split(b"\n", 1)
-    BUFFERS[key] = rest
-    return line.decode(ENC, errors="replace")
+def send_leave(conn):
+    conn.sendall(MSG_LEAVE)
+
+
+def send_list(conn):
+    conn.sendall(MSG_LIST)
+
+
+def send_quit(conn):
+    conn.sendall(MSG_QUIT)
+
+
+def recv_lines(conn):
+    """Yield every complete line available, reading the socket at most once.
+
+    Yields None on EOF. Lines not consumed by the caller stay buffered.
+    """
+    global _RX_SCAN
+    buf = _RX_BUF
+
+    idx = buf.find(b"\n", _RX_SCAN)
+    if idx < 0:
+        _RX_SCAN = len(buf)
+        n = conn.recv_into(_SCRATCH_MV)
+        if n == 0:
+            buf.clear()
+            _RX_SCAN = 0
+            yield None
+            return
+        buf.extend(_SCRATCH_MV[:n])
+        idx = buf.find(b"\n", _RX_SCAN)
+
+    while idx >= 0:
+        # Keep the residual in the same bytearray (no reassignment). The
+        # slice is handed to loads() as-is: no bytes() copy, no str decode.
+        line = buf[:idx]
+        del buf[:idx + 1]
+        _RX_SCAN = 0
+        yield line
+        idx = buf.find(b"\n")
+    _RX_SCAN = len(buf)
+
+
+def recv_line(conn):
+    while True:
+        for line in recv_lines(conn):
+            return line
 
 
 def recv_json(conn):
     line = recv_line(conn)
     if line is None:
         return None
-    return json.loads(line)
+    return loads(line)
+
+
+def has_buffered_line(conn):
+    """True if a full message is already buffered (select() would not report it)."""
+    return _RX_BUF.find(b"\n", _RX_SCAN) >= 0
+
+
+def init_selector(sock):
+    global SELECTOR, STDIN_IN_SELECTOR
+    if HAS_MS:
+        # Windows select() only supports sockets; the console is polled via msvcrt.
+        SELECTOR = selectors.SelectSelector()
+    else:
+        SELECTOR = selectors.DefaultSelector()
+        try:
+            SELECTOR.register(sys.stdin, selectors.EVENT_READ)
+            STDIN_IN_SELECTOR = True
+        except (PermissionError, ValueError, OSError):
+            # e.g. `client.py < script.txt`: epoll rejects regular files.
+            STDIN_IN_SELECTOR = False
+    SELECTOR.register(sock, selectors.EVENT_READ)
+
+
+def socket_ready(sock, events):
+    return any(key.fileobj is sock for key, _ in events)
+
+
+# Server frames start with {"type": ...}; sniffing it lets us skip full parses.
+_TYPE_RE = re.compile(rb'"type"\s*:\s*"([A-Z_]+)"')
 
 
 def wait_for_types(sock, wanted_types):
     """Block until a message type in wanted_types arrives (prints OK/ERR along the way)."""
     while True:
-        msg = recv_json(sock)
-        if msg is None:
-            return None
-        t = msg.get("type")
-        if t in wanted_types:
-            return msg
-        if t == "OK" and msg.get("msg"):
-            print(f"✅ {msg['msg']}")
-        if t == "ERR":
-            print(f"❌ {msg.get('msg')}")
-            if msg.get("hint"):
-                print(f"➡ {msg['hint']}")
+        # Handle every frame from one recv before reading again.
+        for line in recv_lines(sock):
+            if line is None:
+                return None
+            m = _TYPE_RE.search(line)
+            if m is not None:
+                t = m.group(1).decode()
+                if t not in wanted_types and t not in ("OK", "ERR"):
+                    continue  # nothing to return or print: don't parse it
+            msg = loads(line)
+            t = msg.get("type")
+            if t in wanted_types:
+                return msg
+            if t == "OK" and msg.get("msg"):
+                print(f"✅ {msg['msg']}")
+            if t == "ERR":
+                print(f"❌ {msg.get('msg')}")
+                if msg.get("hint"):
+                    print(f"➡ {msg['hint']}")
 
 
 def drain_socket(sock):
     """Drain any pending messages (used when returning to lobby)."""
     while True:
-        r, _, _ = select.select([sock], [], [], 0)
-        if not r:
+        if not has_buffered_line(sock) and not socket_ready(sock, SELECTOR.select(timeout=0)):
             return
         msg = recv_json(sock)
         if msg is None:
@@ -93,7 +229,7 @@ def print_game_help(n):
     print(
         f"""
 Commands (In Game):
-  row col           - make a move (example: 0 2)   [only on your turn]  [valid range: 0..{n-1}]
+  row col           - make a move (example: 0 2 or 0,2)   [only on your turn]  [valid range: 0..{n-1}]
   00                - shorthand for 0 0           [only on your turn]
   INFO              - show this help
   LEAVE             - leave game and return to lobby (works anytime)
@@ -103,12 +239,14 @@ Commands (In Game):
 
 
 def print_board(board):
-    n = len(board)
-    print()
-    print("   " + " ".join(str(i) for i in range(n)))
-    for r in range(n):
-        print(f"{r}  " + " ".join(board[r]))
-    print()
+    # The server sends the board as one string, one row per line.
+    rows = board.split("\n")
+    n = len(rows)
+    lines = ["", "   " + " ".join(map(str, range(n)))]
+    lines.extend(f"{r}  " + " ".join(rows[r]) for r in range(n))
+    lines.append("")
+    # One write instead of a print() per row.
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def pretty_print_games(ans):
@@ -133,42 +271,37 @@ def find_turn_player_name(state):
     return None
 
 
+_KEYWORDS = frozenset({"leave", "quit", "info", "help", "?"})
+_MOVE_RE = re.compile(r"^\s*(\d+)(?:\s*,\s*|\s+)(\d+)\s*$", re.ASCII)  # "0 2" or "0,2"
+_SHORT_RE = re.compile(r"^\s*(\d)(\d)\s*$", re.ASCII)  # "02" == "0 2"
+
+
 def parse_input(raw: str):
-    raw = (raw or "").strip()
     if not raw:
         return None
 
-    low = raw.lower()
-    if low in ("leave", "quit", "info", "help", "?"):
-        return low
-
-    parts = raw.split()
-    if len(parts) == 1 and len(parts[0]) == 2 and parts[0].isdigit():
-        parts = [parts[0][0], parts[0][1]]
+    m = _MOVE_RE.match(raw) or _SHORT_RE.match(raw)
+    if m:
+        return (int(m.group(1)), int(m.group(2)))
 
-    if len(parts) != 2:
-        return None
-
-    try:
-        r = int(parts[0])
-        c = int(parts[1])
-    except Exception:
-        return None
+    low = raw.strip().lower()
+    if low in _KEYWORDS:
+        return low
+    return None
 
-    return (r, c)
 
+def _timed_input_windows_poll(sock):
+    """Windows fallback when stdin is not a console (redirected/piped).
 
-def timed_input_windows(prompt, sock):
-    """Windows: allow socket updates while typing."""
-    print(prompt, end="", flush=True)
+    The handle cannot be waited on like a console, so poll: 50 ms socket
+    waits between kbhit() checks.
+    """
     buf = ""
     while True:
-        r, _, _ = select.select([sock], [], [], 0)
-        if r:
+        if socket_ready(sock, SELECTOR.select(timeout=0.05)):
             msg = recv_json(sock)
             return None, msg
-
-        if msvcrt.kbhit():
+        while msvcrt.kbhit():
             ch = msvcrt.getwch()
             if ch in ("\r", "\n"):
                 print()
@@ -181,18 +314,79 @@ def timed_input_windows(prompt, sock):
                 buf += ch
                 print(ch, end="", flush=True)
 
-        time.sleep(0.05)
+
+def timed_input_windows(prompt, sock):
+    """Windows: allow socket updates while typing.
+
+    Blocks in WaitForMultipleObjects on the console handle and a socket
+    event, so there is no polling between keystrokes.
+    """
+    print(prompt, end="", flush=True)
+    if has_buffered_line(sock):
+        return None, recv_json(sock)
+
+    stdin_h = _kernel32.GetStdHandle(STD_INPUT_HANDLE)
+    mode = wintypes.DWORD()
+    if not _kernel32.GetConsoleMode(stdin_h, ctypes.byref(mode)):
+        return _timed_input_windows_poll(sock)
+
+    buf = ""
+    event = _ws2_32.WSACreateEvent()
+    if event == WSA_INVALID_EVENT:
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        _ws2_32.WSAEventSelect(sock.fileno(), event, FD_READ | FD_CLOSE)
+        handles = (wintypes.HANDLE * 2)(stdin_h, event)
+        while True:
+            rc = _kernel32.WaitForMultipleObjects(2, handles, False, INFINITE)
+            if rc == WAIT_OBJECT_0 + 1:
+                break  # socket readable (or closed)
+            if rc == WAIT_FAILED:
+                raise ctypes.WinError(ctypes.get_last_error())
+            if rc != WAIT_OBJECT_0:
+                raise OSError("WaitForMultipleObjects returned 0x%08X" % rc)
+
+            if not msvcrt.kbhit():
+                # Only non-character console events (key up, focus, mouse):
+                # discard them, otherwise the handle stays signaled.
+                _kernel32.FlushConsoleInputBuffer(stdin_h)
+                continue
+
+            while msvcrt.kbhit():
+                ch = msvcrt.getwch()
+                if ch in ("\r", "\n"):
+                    print()
+                    return buf, None
+                if ch == "\b":
+                    if buf:
+                        buf = buf[:-1]
+                        print("\b \b", end="", flush=True)
+                else:
+                    buf += ch
+                    print(ch, end="", flush=True)
+    finally:
+        # WSAEventSelect puts the socket in non-blocking mode; undo both.
+        _ws2_32.WSAEventSelect(sock.fileno(), None, 0)
+        sock.setblocking(True)
+        _ws2_32.WSACloseEvent(event)
+
+    msg = recv_json(sock)
+    return None, msg
 
 
 def timed_input_posix(prompt, sock):
     """POSIX: wait for either a socket message or a full line from stdin."""
     print(prompt, end="", flush=True)
+    if has_buffered_line(sock):
+        return None, recv_json(sock)
     while True:
-        r, _, _ = select.select([sock, sys.stdin], [], [], 0.1)
-        if sock in r:
+        # Block until the kernel reports an event; no polling timer. Unregistered
+        # stdin is always readable, so then only peek at the socket.
+        events = SELECTOR.select() if STDIN_IN_SELECTOR else SELECTOR.select(timeout=0)
+        if socket_ready(sock, events):
             msg = recv_json(sock)
             return None, msg
-        if sys.stdin in r:
+        if events or not STDIN_IN_SELECTOR:
             line = sys.stdin.readline()
             if line == "":
                 return "quit", None
@@ -263,7 +457,7 @@ def prompt_action(state, my_name, my_mark, sock, allow_move: bool):
 
 def leave_and_wait_ok(sock):
     """Send LEAVE and wait until we get OK (ignore START/WAIT/GAME_UPDATE noise)."""
-    send_json(sock, {"type": "LEAVE"})
+    send_leave(sock)
     while True:
         msg = recv_json(sock)
         if msg is None:
@@ -283,11 +477,167 @@ def leave_and_wait_ok(sock):
                 print(f"Game ended: {res['msg']}")
 
 
+class Ctx:
+    """Per-session client state shared by the in-game message handlers."""
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        # Bound once: MOVE is the most latency-sensitive send.
+        self.send = sock.sendall
+        self.name = name
+        self.in_game = False
+        self.last_state = None
+        self.my_mark = None
+        self.pending_msg = None
+        self.quit = False
+
+    def back_to_lobby(self):
+        self.in_game = False
+        self.last_state = None
+        self.my_mark = None
+
+
+def _do_action(action, ctx):
+    if action[0] == "INCOMING":
+        ctx.pending_msg = action[1]
+    elif action[0] == "LEAVE":
+        leave_and_wait_ok(ctx.sock)
+        ctx.back_to_lobby()
+    elif action[0] == "QUIT":
+        send_quit(ctx.sock)
+        ctx.quit = True
+    elif action[0] == "MOVE":
+        _, r, c = action
+        ctx.send(_MOVE_TMPL % (r, c))
+
+
+def _on_joined(msg, ctx):
+    state = msg.get("state")
+    you = msg.get("you", {})
+    if state and you.get("mark"):
+        ctx.my_mark = you["mark"]
+    if msg.get("waiting_for"):
+        # Game not full: no WAIT follows for us, so show the board and prompt now.
+        _on_state(msg, ctx)
+        return
+    if msg.get("msg"):
+        print(f"\nℹ {msg['msg']}")
+    if state:
+        ctx.last_state = state
+
+
+def _on_state(msg, ctx):
+    """WAIT / START / GAME_UPDATE."""
+    state = msg.get("state")
+    if not state:
+        return
+    ctx.last_state = state
+
+    if ctx.my_mark is None:
+        for p in state.get("players", []):
+            if p.get("name") == ctx.name:
+                ctx.my_mark = p.get("mark")
+                break
+
+    if msg.get("msg"):
+        print(f"\nℹ {msg['msg']}")
+
+    turn_name = find_turn_player_name(state)
+    turn_mark = state.get("turn")
+    print(f"\nGame {state['id']} | status={state['status']} | turn={turn_name} ({turn_mark})")
+    print("Players:", state.get("players"))
+    print_board(state.get("board"))
+
+    # FLOW FIX: don't prompt during transient WAITING when game is already full
+    if state.get("status") == "WAITING":
+        try:
+            if len(state.get("players", [])) == int(state.get("max_players")):
+                return
+        except Exception:
+            pass
+
+    if state.get("status") in ("WAITING", "RUNNING"):
+        my_turn = (state.get("status") == "RUNNING") and (ctx.my_mark is not None) and (turn_mark == ctx.my_mark)
+        _do_action(prompt_action(state, ctx.name, ctx.my_mark, ctx.sock, allow_move=my_turn), ctx)
+
+
+def _on_err(msg, ctx):
+    print(f"\n❌ Error: {msg.get('msg')}")
+    if msg.get("hint"):
+        print(f"➡ Next: {msg['hint']}")
+
+    last_state = ctx.last_state
+    if last_state and ctx.my_mark is not None and last_state.get("status") in ("WAITING", "RUNNING"):
+        turn_mark = last_state.get("turn")
+        my_turn = (last_state.get("status") == "RUNNING") and (turn_mark == ctx.my_mark)
+        _do_action(prompt_action(last_state, ctx.name, ctx.my_mark, ctx.sock, allow_move=my_turn), ctx)
+
+
+def _on_end(msg, ctx):
+    res = msg.get("result", {})
+    state = msg.get("state")
+    if state:
+        print_board(state.get("board"))
+    if res.get("msg"):
+        print(f"Game ended: {res['msg']}")
+    elif res.get("winner"):
+        print("🏆 Winner:", res["winner"])
+    else:
+        print("Game ended.")
+
+    # Return to lobby cleanly
+    leave_and_wait_ok(ctx.sock)
+    ctx.back_to_lobby()
+
+
+def _on_ok(msg, ctx):
+    if msg.get("msg"):
+        print(f"✅ {msg['msg']}")
+
+
+def _on_other(msg, ctx):
+    print("[MSG]", msg)
+
+
+HANDLERS = {
+    "JOINED": _on_joined,
+    "WAIT": _on_state,
+    "START": _on_state,
+    "GAME_UPDATE": _on_state,
+    "ERR": _on_err,
+    "END": _on_end,
+    "OK": _on_ok,
+}
+
+
 def main():
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.connect((HOST, PORT))
+    # Small request/response messages: don't let Nagle delay them.
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    init_selector(s)
+
+    try:
+        run(s)
+    except KeyboardInterrupt:
+        try:
+            send_quit(s)
+        except Exception:
+            pass
+    finally:
+        try:
+            s.close()
+        except Exception:
+            pass
+
+
+def run(s):
+    # Locals instead of globals on every message (LOAD_FAST vs LOAD_GLOBAL).
+    _recv_json = recv_json
+    _send_json = send_json
 
-    msg = recv_json(s)
+    msg = _recv_json(s)
     if msg and msg.get("msg"):
         print(msg["msg"])
 
@@ -296,7 +646,7 @@ def main():
         name = input("Enter your name: ").strip()
         if not name:
             name = "player"
-        send_json(s, {"type": "HELLO", "name": name})
+        _send_json(s, {"type": "HELLO", "name": name})
         ans = wait_for_types(s, {"OK", "ERR"})
         if ans is None:
             print("Disconnected.")
@@ -309,13 +659,11 @@ def main():
         if ans.get("hint"):
             print(f"➡ {ans['hint']}")
 
-    in_game = False
-    last_state = None
-    my_mark = None
-    pending_msg = None
+    ctx = Ctx(s, name)
+    handlers = HANDLERS
 
     while True:
-        if not in_game:
+        if not ctx.in_game:
             drain_socket(s)
             cmd = input("Command [LIST | CREATE 2/3 | JOIN <id> | INFO | QUIT]: ").strip()
             if not cmd:
@@ -329,7 +677,7 @@ def main():
                 continue
 
             if op == "LIST":
-                send_json(s, {"type": "LIST"})
+                send_list(s)
                 ans = wait_for_types(s, {"GAMES", "ERR"})
                 if ans is None:
                     print("Disconnected.")
@@ -340,7 +688,7 @@ def main():
 
             if op == "CREATE":
                 players = int(parts[1]) if len(parts) > 1 else 2
-                send_json(s, {"type": "CREATE", "players": players})
+                _send_json(s, {"type": "CREATE", "players": players})
                 ans = wait_for_types(s, {"OK", "ERR"})
                 if ans is None:
                     print("Disconnected.")
@@ -354,7 +702,7 @@ def main():
                     print("❌ CREATE failed (no game_id).")
                     continue
 
-                send_json(s, {"type": "JOIN", "game_id": game_id})
+                _send_json(s, {"type": "JOIN", "game_id": game_id})
                 ans2 = wait_for_types(s, {"JOINED", "ERR"})
                 if ans2 is None:
                     print("Disconnected.")
@@ -363,8 +711,8 @@ def main():
                     print(f"❌ {ans2.get('msg')}")
                     continue
 
-                in_game = True
-                pending_msg = ans2
+                ctx.in_game = True
+                ctx.pending_msg = ans2
                 continue
 
             if op == "JOIN":
@@ -373,7 +721,7 @@ def main():
                     continue
 
                 game_id = parts[1]
-                send_json(s, {"type": "JOIN", "game_id": game_id})
+                _send_json(s, {"type": "JOIN", "game_id": game_id})
                 ans = wait_for_types(s, {"JOINED", "ERR"})
                 if ans is None:
                     print("Disconnected.")
@@ -382,166 +730,29 @@ def main():
                     print(f"❌ {ans.get('msg')}")
                     continue
 
-                in_game = True
-                pending_msg = ans
+                ctx.in_game = True
+                ctx.pending_msg = ans
                 continue
 
             if op == "QUIT":
-                send_json(s, {"type": "QUIT"})
+                send_quit(s)
                 break
 
             print("Unknown command. Use INFO.")
             continue
 
         # -------- In game --------
-        msg = pending_msg if pending_msg is not None else recv_json(s)
-        pending_msg = None
+        msg = ctx.pending_msg if ctx.pending_msg is not None else _recv_json(s)
+        ctx.pending_msg = None
 
         if msg is None:
             print("Disconnected.")
             break
 
-        mtype = msg.get("type")
-
-        if mtype == "JOINED":
-            state = msg.get("state")
-            if msg.get("msg"):
-                print(f"\nℹ {msg['msg']}")
-            if state:
-                last_state = state
-                you = msg.get("you", {})
-                if you.get("mark"):
-                    my_mark = you["mark"]
-            continue
-
-        if mtype in ("WAIT", "START", "GAME_UPDATE"):
-            state = msg.get("state")
-            if not state:
-                continue
-            last_state = state
-
-            if my_mark is None:
-                for p in state.get("players", []):
-                    if p.get("name") == name:
-                        my_mark = p.get("mark")
-                        break
-
-            if msg.get("msg"):
-                print(f"\nℹ {msg['msg']}")
-
-            turn_name = find_turn_player_name(state)
-            turn_mark = state.get("turn")
-            print(f"\nGame {state['id']} | status={state['status']} | turn={turn_name} ({turn_mark})")
-            print("Players:", state.get("players"))
-            print_board(state.get("board"))
-
-            # FLOW FIX: don't prompt during transient WAITING when game is already full
-            if state.get("status") == "WAITING":
-                try:
-                    if len(state.get("players", [])) == int(state.get("max_players")):
-                        continue
-                except Exception:
-                    pass
-
-            if state.get("status") in ("WAITING", "RUNNING"):
-                my_turn = (state.get("status") == "RUNNING") and (my_mark is not None) and (turn_mark == my_mark)
-                action = prompt_action(state, name, my_mark, s, allow_move=my_turn)
-
-                if action[0] == "INCOMING":
-                    pending_msg = action[1]
-                    continue
-
-                if action[0] == "LEAVE":
-                    leave_and_wait_ok(s)
-                    in_game = False
-                    last_state = None
-                    my_mark = None
-                    continue
-
-                if action[0] == "QUIT":
-                    send_json(s, {"type": "QUIT"})
-                    break
-
-                if action[0] == "MOVE":
-                    _, r, c = action
-                    send_json(s, {"type": "MOVE", "row": r, "col": c})
-                    continue
-
-            continue
-
-        if mtype == "ERR":
-            print(f"\n❌ Error: {msg.get('msg')}")
-            if msg.get("hint"):
-                print(f"➡ Next: {msg['hint']}")
-
-            if in_game and last_state and my_mark is not None and last_state.get("status") in ("WAITING", "RUNNING"):
-                turn_mark = last_state.get("turn")
-                my_turn = (last_state.get("status") == "RUNNING") and (turn_mark == my_mark)
-                action = prompt_action(last_state, name, my_mark, s, allow_move=my_turn)
-
-                if action[0] == "INCOMING":
-                    pending_msg = action[1]
-                    continue
-                if action[0] == "LEAVE":
-                    leave_and_wait_ok(s)
-                    in_game = False
-                    last_state = None
-                    my_mark = None
-                    continue
-                if action[0] == "QUIT":
-                    send_json(s, {"type": "QUIT"})
-                    break
-                if action[0] == "MOVE":
-                    _, r, c = action
-                    send_json(s, {"type": "MOVE", "row": r, "col": c})
-                    continue
-            continue
-
-        if mtype == "END":
-            res = msg.get("result", {})
-            state = msg.get("state")
-            if state:
-                print_board(state.get("board"))
-            if res.get("msg"):
-                print(f"Game ended: {res['msg']}")
-            elif res.get("winner"):
-                print("🏆 Winner:", res["winner"])
-            else:
-                print("Game ended.")
-
-            # Return to lobby cleanly
-            leave_and_wait_ok(s)
-            in_game = False
-            last_state = None
-            my_mark = None
-            continue
-
-        if mtype == "OK":
-            if msg.get("msg"):
-                print(f"✅ {msg['msg']}")
-            continue
-
-        print("[MSG]", msg)
-
-    try:
-        BUFFERS.pop(s.fileno(), None)
-    except Exception:
-        pass
-    try:
-        s.close()
-    except Exception:
-        pass
+        handlers.get(msg.get("type"), _on_other)(msg, ctx)
+        if ctx.quit:
+            break
 
-    except KeyboardInterrupt:
-        try:
-            send_json(s, {"type": "QUIT"})
-        except Exception:
-            pass
-    finally:
-        try:
-            s.close()
-        except Exception:
-            pass
 
 if __name__ == "__main__":
     main()
@@ -1,54 +1,155 @@
+import errno
 import socket
-import threading
+import selectors
 import json
-import uuid
+import random
+import time
+from functools import lru_cache
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson  # optional, much faster than stdlib json
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 
 HOST = "127.0.0.1"
 PORT = 5001
 ENC = "utf-8"
 
-# Per-connection receive buffer (newline-delimited JSON).
-BUFFERS: Dict[int, bytes] = {}
+# A client sending more than this without a newline is dropped (unbounded buffer otherwise).
+MAX_LINE = 64 * 1024
+
+# Bytes asked for per recv(): drains everything queued for a client in one call.
+RECV_SIZE = 64 * 1024
+
+# Unsent output a client may pile up (it is not reading) before it is disconnected.
+MAX_TX_BACKLOG = 256 * 1024
+
+# Lines handled per client per loop pass, so one pipelining client cannot hog the loop.
+MAX_LINES_PER_EVENT = 32
+
+# Seconds to stop accepting after running out of file descriptors.
+ACCEPT_BACKOFF = 0.5
+
+
+decode_json: Callable[[Union[bytes, bytearray]], Any]
+
+if HAS_ORJSON:
+    def encode_json(obj: dict) -> bytes:
+        # orjson writes the trailing newline itself: one bytes object, no concat copy.
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+    decode_json = orjson.loads
+else:
+    def encode_json(obj: dict) -> bytes:
+        return (json.dumps(obj) + "\n").encode(ENC)
+
+    decode_json = json.loads  # accepts bytes as well
 
 
 def send_json(conn: socket.socket, obj: dict) -> None:
-    conn.sendall((json.dumps(obj) + "\n").encode(ENC))
+    send_raw(conn, encode_json(obj))
 
 
-def recv_line(conn: socket.socket) -> Optional[str]:
-    key = id(conn)
-    buf = BUFFERS.get(key, b"")
+def take_lines(buf: bytearray, limit: int) -> List[bytearray]:
+    """Remove and return up to limit complete lines from the front of buf.
 
-    while b"\n" not in buf:
-        chunk = conn.recv(4096)
-        if not chunk:
-            BUFFERS.pop(key, None)
-            return None
-        buf += chunk
+    buf is the connection's own receive buffer; whatever is not taken stays in it.
+    """
+    # The slice is the only copy: both orjson.loads and json.loads accept a bytearray.
+    lines: List[bytearray] = []
+    start = 0
+    idx = buf.find(b"\n")
+    while idx >= 0 and len(lines) < limit:
+        lines.append(buf[start:idx])
+        start = idx + 1
+        idx = buf.find(b"\n", start)
+    del buf[:start]
 
-    line, rest = buf.split(b"\n", 1)
-    BUFFERS[key] = rest
-    return line.decode(ENC, errors="replace")
+    if idx < 0 and len(buf) > MAX_LINE:
+        raise ValueError(f"line exceeds {MAX_LINE} bytes")
+    return lines
 
 
-def recv_json(conn: socket.socket) -> Optional[dict]:
-    line = recv_line(conn)
-    if line is None:
-        return None
+def parse_json(line: bytearray) -> dict:
+    # Raw bytes go straight to the parser: no UTF-8 decode to str first.
     try:
-        return json.loads(line)
-    except json.JSONDecodeError:
+        msg = decode_json(line)
+    except ValueError:  # JSONDecodeError, or invalid UTF-8
         return {"type": "__BAD_JSON__"}
-
-
-def err(conn: socket.socket, msg: str, hint: str = "") -> None:
+    # Valid JSON that is not an object (e.g. a bare number) is just as unusable.
+    return msg if isinstance(msg, dict) else {"type": "__BAD_JSON__"}
+
+
+def encode_with_state(obj: dict, state_json: bytes) -> bytes:
+    """Same as encode_json({**obj, "state": ...}) but splices in an already-encoded state."""
+    head = encode_json(obj)  # b'{...}\n'
+    return head[:-2] + b',"state":' + state_json + b"}\n"
+
+
+def send_raw(conn: socket.socket, blob: bytes) -> None:
+    """Send blob to a client without blocking; what the socket won't take now is queued.
+
+    Raises ConnectionError (an OSError, like a failed send) if conn is no longer a
+    client or its queued output would exceed MAX_TX_BACKLOG.
+    """
+    st = server_state.clients.get(conn)
+    if st is None:
+        raise ConnectionError("not a connected client")
+    if not st.tx_buf:
+        try:
+            sent = conn.send(blob)
+        except BlockingIOError:
+            sent = 0
+        if sent == len(blob):
+            return
+        blob = blob[sent:]
+        st.sel.modify(conn, selectors.EVENT_READ | selectors.EVENT_WRITE, st)
+    if len(st.tx_buf) + len(blob) > MAX_TX_BACKLOG:
+        raise ConnectionError(f"client is not reading: over {MAX_TX_BACKLOG} bytes queued")
+    st.tx_buf += blob
+
+
+# Invariant replies, serialized once at import.
+_WELCOME = encode_json({"type": "WELCOME", "msg": "Connected to server."})
+_INFO_OK = encode_json({"type": "OK", "msg": "Use client-side INFO for commands."})
+_LEFT_OK = encode_json({"type": "OK", "msg": "Left game. You can LIST/CREATE/JOIN again."})
+_BYE = encode_json({"type": "OK", "msg": "Bye"})
+
+
+def encode_err(msg: str, hint: str = "") -> bytes:
     payload = {"type": "ERR", "msg": msg}
     if hint:
         payload["hint"] = hint
-    send_json(conn, payload)
+    return encode_json(payload)
+
+
+def err(conn: socket.socket, msg: str, hint: str = "") -> None:
+    """Send an ERR whose text is built per call; fixed errors use the _ERR_* constants below."""
+    send_raw(conn, encode_err(msg, hint))
+
+
+# Fixed error replies, encoded once at import.
+_ERR_NAME_SET = encode_err("Name already set.", "Continue in lobby (LIST/CREATE/JOIN) or QUIT.")
+_ERR_NAME_EMPTY = encode_err("Name cannot be empty.", "Enter a non-empty name.")
+_ERR_NAME_TAKEN = encode_err("Name already exists.", "Please choose a different name.")
+_ERR_CREATE_IN_GAME = encode_err("Already in a game.", "Use LEAVE to return to lobby, then CREATE again.")
+_ERR_JOIN_IN_GAME = encode_err("Already in a game.", "Use LEAVE to return to lobby, then JOIN another game.")
+_ERR_NO_GAME_ID = encode_err("Missing game_id.", "Use JOIN <id> (Tip: use LIST).")
+_ERR_GAME_NOT_FOUND = encode_err("Game not found.", "Use LIST to get a valid id.")
+_ERR_GAME_NOT_WAITING = encode_err("Game already started/finished.", "Use LIST to find a WAITING game.")
+_ERR_GAME_FULL = encode_err("Game is full.", "Use LIST and join another game.")
+_ERR_LEAVE_NOT_IN_GAME = encode_err("Not in a game.", "Use LIST/CREATE/JOIN first.")
+_ERR_NEED_NAME = encode_err("You must set a unique name first.", "Send HELLO with your chosen name.")
+_ERR_PLAYER_COUNT = encode_err("Only 2 or 3 players supported.", "Use: CREATE 2  or  CREATE 3")
+_ERR_MOVE_NOT_IN_GAME = encode_err("Not in a game.", "JOIN a game first.")
+_ERR_NOT_RUNNING = encode_err("Game not running.", "Wait for START or JOIN another game.")
+_ERR_NOT_YOUR_TURN = encode_err("Not your turn.", "Allowed while waiting: INFO or LEAVE (or QUIT).")
+_ERR_CELL_TAKEN = encode_err("Cell is not empty.", "Choose a different empty cell.")
+_ERR_BAD_JSON = encode_err("Bad message format (invalid JSON).", "Try again.")
 
 
 def safe_close(conn: socket.socket) -> None:
@@ -58,181 +159,252 @@ def safe_close(conn: socket.socket) -> None:
         pass
 
 
-def check_winner_3_in_row(board: List[List[str]]) -> Optional[str]:
-    n = len(board)
-    target = 3
+# Boards are flat bytearrays of cell codes (index r * n + c); code 0 is an empty cell.
+CELL_CHARS = " XOΔ"
+MARK_CODES: Dict[str, int] = {ch: code for code, ch in enumerate(CELL_CHARS)}
+
 
-    def in_bounds(r: int, c: int) -> bool:
-        return 0 <= r < n and 0 <= c < n
+WinLine = Tuple[int, int, int]  # three flat board indices
 
-    directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+@lru_cache(maxsize=None)
+def win_lines(n: int) -> Tuple[WinLine, ...]:
+    """Every 3-in-a-row on an n x n board (rows, cols, both diagonals), built once per n."""
+    lines: List[WinLine] = []
     for r in range(n):
         for c in range(n):
-            mark = board[r][c]
-            if mark == " ":
-                continue
-            for dr, dc in directions:
-                ok = True
-                for k in range(1, target):
-                    rr, cc = r + dr * k, c + dc * k
-                    if not in_bounds(rr, cc) or board[rr][cc] != mark:
-                        ok = False
-                        break
-                if ok:
-                    return mark
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                r2, c2 = r + 2 * dr, c + 2 * dc
+                if 0 <= r2 < n and 0 <= c2 < n:
+                    lines.append((r * n + c, (r + dr) * n + (c + dc), r2 * n + c2))
+    return tuple(lines)
+
+
+@lru_cache(maxsize=None)
+def win_lines_through(n: int) -> Tuple[Tuple[WinLine, ...], ...]:
+    """win_lines(n) grouped by cell: entry i holds the lines that contain flat index i."""
+    by_cell: List[List[WinLine]] = [[] for _ in range(n * n)]
+    for line in win_lines(n):
+        for i in line:
+            by_cell[i].append(line)
+    return tuple(tuple(ls) for ls in by_cell)
+
+
+def check_winner_after_move(board: bytearray, n: int, r: int, c: int) -> Optional[str]:
+    """Only lines through the just-played cell (r, c) can form a new win."""
+    idx = r * n + c
+    code = board[idx]
+    for a, b, c2 in win_lines_through(n)[idx]:
+        if board[a] == code and board[b] == code and board[c2] == code:
+            return CELL_CHARS[code]
     return None
 
 
-def board_full(board: List[List[str]]) -> bool:
-    return all(cell != " " for row in board for cell in row)
-
-
-@dataclass
+@dataclass(slots=True)
 class Player:
     conn: socket.socket
     name: str
     mark: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Game:
     game_id: str
     max_players: int
     board_size: int
     creator: str
     players: List[Player] = field(default_factory=list)
-    board: List[List[str]] = field(default_factory=list)
+    board: bytearray = field(default_factory=bytearray)
     turn_index: int = 0
     status: str = "WAITING"  # WAITING / RUNNING / FINISHED
-    lock: threading.Lock = field(default_factory=threading.Lock)
+    marks: Tuple[str, ...] = ()  # mark for the i-th player to join
+    # Decremented on every accepted MOVE; 0 means the board is full (draw check is O(1)).
+    empty_cells: int = field(default=0, init=False)
+    # Built lazily by snapshot(); reset by invalidate_snapshot() on every mutation.
+    _snapshot_cache: Optional[dict] = field(default=None, init=False, repr=False)
+    _snapshot_json: Optional[bytes] = field(default=None, init=False, repr=False)
+    # Player list as sent in snapshots; only JOIN/LEAVE change it, so MOVEs reuse it.
+    _players_cache: Optional[List[dict]] = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
-        self.board = [[" " for _ in range(self.board_size)] for _ in range(self.board_size)]
+        self.board = bytearray(self.board_size * self.board_size)
+        self.empty_cells = self.board_size * self.board_size
 
-    def snapshot(self) -> dict:
-        return {
-            "id": self.game_id,
-            "creator": self.creator,
-            "players": [{"name": p.name, "mark": p.mark} for p in self.players],
-            "max_players": self.max_players,
-            "board_size": self.board_size,
-            "board": self.board,
-            "turn": self.players[self.turn_index].mark if self.players else None,
-            "status": self.status,
-        }
-
-    def broadcast(self, obj: dict) -> None:
-        for p in list(self.players):
-            try:
-                send_json(p.conn, obj)
-            except Exception:
-                pass
+    def cell(self, r: int, c: int) -> str:
+        return CELL_CHARS[self.board[r * self.board_size + c]]
+
+    def set_cell(self, r: int, c: int, mark: str) -> None:
+        self.board[r * self.board_size + c] = MARK_CODES[mark]
+
+    def board_text(self) -> str:
+        """Board as one string, rows separated by "\n" (e.g. "X  \n O \n   ")."""
+        n = self.board_size
+        cells = "".join([CELL_CHARS[code] for code in self.board])
+        return "\n".join([cells[i * n:(i + 1) * n] for i in range(n)])
+
+    def invalidate_snapshot(self) -> None:
+        """Call after changing board, turn_index, status or players."""
+        self._snapshot_cache = None
+        self._snapshot_json = None
 
+    def invalidate_players(self) -> None:
+        """Call after adding or removing a player (also invalidates the snapshot)."""
+        self._players_cache = None
+        self.invalidate_snapshot()
 
-    def broadcast_collect_dead(self, obj: dict) -> List[socket.socket]:
+    def players_view(self) -> List[dict]:
+        if self._players_cache is None:
+            self._players_cache = [{"name": p.name, "mark": p.mark} for p in self.players]
+        return self._players_cache
+
+    def snapshot(self) -> dict:
+        if self._snapshot_cache is None:
+            self._snapshot_cache = {
+                "id": self.game_id,
+                "creator": self.creator,
+                "players": self.players_view(),
+                "max_players": self.max_players,
+                "board_size": self.board_size,
+                "board": self.board_text(),
+                "turn": self.players[self.turn_index].mark if self.players else None,
+                "status": self.status,
+            }
+        return self._snapshot_cache
+
+    def snapshot_json(self) -> bytes:
+        """snapshot() serialized (no trailing newline), for encode_with_state()."""
+        if self._snapshot_json is None:
+            self._snapshot_json = encode_json(self.snapshot())[:-1]
+        return self._snapshot_json
+
+    # Callers encode a frame once and fan the same bytes out to every player.
+    # Sends never touch self.players (dead peers are only collected), and the
+    # server is single-threaded, so the loop iterates the list directly.
+    def broadcast_bytes_collect_dead(
+        self, data: bytes, except_conn: Optional[socket.socket] = None
+    ) -> List[socket.socket]:
         dead: List[socket.socket] = []
-        for p in list(self.players):
+        for p in self.players:
+            if p.conn is except_conn:
+                continue
             try:
-                send_json(p.conn, obj)
-            except Exception:
+                send_raw(p.conn, data)
+            except OSError:
                 dead.append(p.conn)
         return dead
 
-    def broadcast_except(self, obj: dict, except_conn: socket.socket) -> None:
-        for p in list(self.players):
-            if p.conn is except_conn:
-                continue
-            try:
-                send_json(p.conn, obj)
-            except Exception:
-                pass
+
+@dataclass(slots=True)
+class ClientState:
+    """Per-connection session state (what used to live in client_thread locals)."""
+
+    conn: socket.socket
+    addr: Tuple[str, int]
+    sel: selectors.BaseSelector
+    current_game: Optional[Game] = None
+    player: Optional[Player] = None
+    # Track name reservation for this connection.
+    name_registered: bool = False
+    client_name: Optional[str] = None
+    # Receive buffer (newline-delimited JSON), owned by this connection.
+    rx_buf: bytearray = field(default_factory=bytearray)
+    # Output the non-blocking socket did not take yet; flushed on EVENT_WRITE.
+    tx_buf: bytearray = field(default_factory=bytearray)
+    closed: bool = False
 
 
 class TicTacToeServer:
+    # All state is touched from the single event-loop thread only: no locks.
     def __init__(self) -> None:
         self.games: Dict[str, Game] = {}
-        self.games_lock = threading.Lock()
+        # Index of JOIN-able games; a game leaves it as soon as it stops being WAITING.
+        self.waiting_games: Dict[str, Game] = {}
 
-        # Enforce unique names across active connections.
-        self.names_lock = threading.Lock()
-        self.active_names: set[str] = set()
+        # Enforce unique names across active connections: name -> owning conn.
+        self.active_names: Dict[str, socket.socket] = {}
+
+        # Every open client connection, and the ones with complete lines still unhandled.
+        self.clients: Dict[socket.socket, ClientState] = {}
+        self.backlogged: Dict[socket.socket, ClientState] = {}
 
         # Connection logging.
-        self.conn_lock = threading.Lock()
         self.connected_count = 0
 
     def log_connect(self, addr: Tuple[str, int]) -> None:
-        with self.conn_lock:
-            self.connected_count += 1
-            print(f"[CONNECTED] {addr} | total={self.connected_count}")
+        self.connected_count += 1
+        print(f"[CONNECTED] {addr} | total={self.connected_count}")
 
     def log_disconnect(self, addr: Tuple[str, int], name: Optional[str]) -> None:
-        with self.conn_lock:
-            self.connected_count = max(0, self.connected_count - 1)
-            who = name if name else "<unknown>"
-            print(f"[DISCONNECTED] {addr} ({who}) | total={self.connected_count}")
+        self.connected_count = max(0, self.connected_count - 1)
+        who = name if name else "<unknown>"
+        print(f"[DISCONNECTED] {addr} ({who}) | total={self.connected_count}")
 
     def list_games(self) -> List[dict]:
         # Only JOIN-able games (WAITING).
-        with self.games_lock:
-            out: List[dict] = []
-            for g in self.games.values():
-                if g.status != "WAITING":
-                    continue
-                out.append(
-                    {
-                        "id": g.game_id,
-                        "players": len(g.players),
-                        "max": g.max_players,
-                        "status": g.status,
-                        "creator": g.creator,
-                    }
-                )
-            return out
+        out: List[dict] = []
+        for g in self.waiting_games.values():
+            out.append(
+                {
+                    "id": g.game_id,
+                    "players": len(g.players),
+                    "max": g.max_players,
+                    "status": g.status,
+                    "creator": g.creator,
+                }
+            )
+        return out
 
     def create_game(self, max_players: int, creator: str) -> Game:
         board_size = max_players + 1
-        game_id = uuid.uuid4().hex[:6].upper()
-        g = Game(game_id=game_id, max_players=max_players, board_size=board_size, creator=creator)
-        with self.games_lock:
-            self.games[game_id] = g
+        # 6 hex digits, as before; ids are lobby handles, not secrets, so plain random is enough.
+        game_id = "%06X" % random.getrandbits(24)
+        while game_id in self.games:
+            game_id = "%06X" % random.getrandbits(24)
+        g = Game(
+            game_id=game_id,
+            max_players=max_players,
+            board_size=board_size,
+            creator=creator,
+            marks=tuple(MARKS_BY_COUNT[max_players]),
+        )
+        self.games[game_id] = g
+        self.waiting_games[game_id] = g
         return g
 
     def get_game(self, game_id: str) -> Optional[Game]:
-        with self.games_lock:
-            return self.games.get(game_id)
+        return self.games.get(game_id)
 
     def remove_game(self, game_id: str) -> None:
-        with self.games_lock:
-            self.games.pop(game_id, None)
+        self.games.pop(game_id, None)
+        self.waiting_games.pop(game_id, None)
 
 
 server_state = TicTacToeServer()
 
 MARKS_BY_COUNT: Dict[int, List[str]] = {2: ["X", "O"], 3: ["X", "O", "Δ"]}
+ALLOWED_PLAYER_COUNTS = frozenset(MARKS_BY_COUNT)
 
 
 def remove_player_from_game(g: Game, conn: socket.socket) -> Optional[str]:
-    left_name: Optional[str] = None
-    new_players: List[Player] = []
-    for p in g.players:
+    for i, p in enumerate(g.players):
         if p.conn is conn:
-            left_name = p.name
-        else:
-            new_players.append(p)
-    g.players = new_players
-    if g.players:
-        g.turn_index %= len(g.players)
-    else:
-        g.turn_index = 0
-    return left_name
+            left_name = g.players.pop(i).name
+            if g.players:
+                g.turn_index %= len(g.players)
+            else:
+                g.turn_index = 0
+            g.invalidate_players()
+            return left_name
+    return None
 
 
 def close_game_for_all(g: Game, reason_msg: str) -> None:
     """Close the game and notify all remaining players."""
     g.status = "FINISHED"
-    dead = g.broadcast_collect_dead(
-        {"type": "END", "result": {"winner": None, "msg": reason_msg}, "state": g.snapshot()}
+    g.invalidate_snapshot()
+    server_state.waiting_games.pop(g.game_id, None)
+    dead = g.broadcast_bytes_collect_dead(
+        encode_with_state({"type": "END", "result": {"winner": None, "msg": reason_msg}}, g.snapshot_json())
     )
     handle_dead_conns_after_send(g, dead, already_ending=True)
 
@@ -240,9 +412,14 @@ def handle_dead_conns_after_send(g: Game, dead: List[socket.socket], already_end
     if not dead:
         return
 
-    # Remove dead players
+    # Remove dead players, and shut their sockets down so the selector reports EOF
+    # right away and client_disconnected() cleans up, instead of waiting for their next read.
     for dc in dead:
         remove_player_from_game(g, dc)
+        try:
+            dc.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
 
     # Requirement: any disconnect closes the game for everyone
     if (not already_ending) and len(g.players) >= 1 and g.status != "FINISHED":
@@ -255,227 +432,379 @@ def handle_dead_conns_after_send(g: Game, dead: List[socket.socket], already_end
         server_state.remove_game(g.game_id)
 
 
-def client_thread(conn: socket.socket, addr: Tuple[str, int]) -> None:
-    current_game: Optional[Game] = None
-    player: Optional[Player] = None
+def handle_hello(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    if st.name_registered:
+        send_raw(conn, _ERR_NAME_SET)
+        return True
+
+    proposed = (msg.get("name") or "").strip()
+    if not proposed:
+        send_raw(conn, _ERR_NAME_EMPTY)
+        return True
+
+    # Test-and-claim in one dict operation.
+    if server_state.active_names.setdefault(proposed, conn) is not conn:
+        send_raw(conn, _ERR_NAME_TAKEN)
+        return True
+
+    st.client_name = proposed
+    st.name_registered = True
+    print(f"[NAME] {st.addr} -> {st.client_name}")
+    send_json(conn, {"type": "OK", "msg": f"Hello {st.client_name}."})
+    return True
+
+
+def handle_list(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    send_json(conn, {"type": "GAMES", "games": server_state.list_games()})
+    return True
+
+
+def handle_create(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    if not st.name_registered or not st.client_name:
+        send_raw(conn, _ERR_NEED_NAME)
+        return True
+    if st.current_game is not None:
+        send_raw(conn, _ERR_CREATE_IN_GAME)
+        return True
+
+    max_players = int(msg.get("players", 2))
+    if max_players not in ALLOWED_PLAYER_COUNTS:
+        send_raw(conn, _ERR_PLAYER_COUNT)
+        return True
+
+    g = server_state.create_game(max_players, creator=st.client_name)
+    send_json(conn, {"type": "OK", "msg": "Game created.", "game_id": g.game_id})
+    return True
+
+
+def handle_join(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    if not st.name_registered or not st.client_name:
+        send_raw(conn, _ERR_NEED_NAME)
+        return True
+    if st.current_game is not None:
+        send_raw(conn, _ERR_JOIN_IN_GAME)
+        return True
+
+    game_id = msg.get("game_id")
+    if not game_id:
+        send_raw(conn, _ERR_NO_GAME_ID)
+        return True
+
+    g = server_state.get_game(game_id)
+    if not g:
+        send_raw(conn, _ERR_GAME_NOT_FOUND)
+        return True
+
+    if g.status != "WAITING":
+        send_raw(conn, _ERR_GAME_NOT_WAITING)
+        return True
+    if len(g.players) >= g.max_players:
+        send_raw(conn, _ERR_GAME_FULL)
+        return True
+
+    # Assign mark by join order.
+    mark = g.marks[len(g.players)]
+    st.player = Player(conn=conn, name=st.client_name, mark=mark)
+    g.players.append(st.player)
+    st.current_game = g
+
+    # IMPORTANT FLOW FIX:
+    # If the game becomes full now, switch to RUNNING BEFORE sending state to clients.
+    is_full = (len(g.players) == g.max_players)
+    if is_full:
+        g.status = "RUNNING"
+        g.turn_index = 0
+        server_state.waiting_games.pop(g.game_id, None)
+    g.invalidate_players()
+
+    # The same state goes out in up to three frames: serialize it once and splice it in.
+    state_json = g.snapshot_json()
+
+    joined: Dict[str, Any] = {
+        "type": "JOINED",
+        "msg": f"Joined game {g.game_id} as {mark}.",
+        "you": {"name": st.client_name, "mark": mark},
+    }
+    if not is_full:
+        # The joiner gets no WAIT of its own: JOINED already carries the state.
+        joined["waiting_for"] = g.max_players - len(g.players)
+    joined_bytes = encode_with_state(joined, state_json)
+
+    if len(g.players) == 1:
+        # Nobody else to tell yet.
+        send_raw(conn, joined_bytes)
+        return True
+
+    update_bytes = encode_with_state(
+        {"type": "GAME_UPDATE", "msg": f"{st.client_name} joined as {mark}."}, state_json
+    )
 
-    # Track name reservation for this connection.
-    name_registered = False
-    client_name: Optional[str] = None
+    # Frames bound for the same peer go out in a single send.
+    if is_full:
+        start_bytes = encode_with_state({"type": "START", "msg": "Game started! X plays first."}, state_json)
+        send_raw(conn, joined_bytes + start_bytes)
+        dead = g.broadcast_bytes_collect_dead(update_bytes + start_bytes, except_conn=conn)
+        handle_dead_conns_after_send(g, dead)
+    else:
+        send_raw(conn, joined_bytes)
+        dead = g.broadcast_bytes_collect_dead(
+            update_bytes + encode_with_state({"type": "WAIT", "msg": "Waiting for more players..."}, state_json),
+            except_conn=conn,
+        )
+        handle_dead_conns_after_send(g, dead)
+    return True
+
+
+def handle_info(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    send_raw(conn, _INFO_OK)
+    return True
+
+
+def handle_leave(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    if not st.current_game or not st.player:
+        send_raw(conn, _ERR_LEAVE_NOT_IN_GAME)
+        return True
 
+    g = st.current_game
+    left_name = remove_player_from_game(g, conn) or "player"
+
+    # Requirement: leaving closes the game for everyone.
+    if g.status in ("WAITING", "RUNNING") and len(g.players) >= 1:
+        close_game_for_all(g, f"Player {left_name} left. Game ended.")
+    else:
+        g.status = "FINISHED"
+        g.invalidate_snapshot()
+
+    if len(g.players) == 0:
+        server_state.remove_game(g.game_id)
+
+    st.current_game = None
+    st.player = None
+    send_raw(conn, _LEFT_OK)
+    return True
+
+
+def handle_move(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    if not st.current_game or not st.player:
+        send_raw(conn, _ERR_MOVE_NOT_IN_GAME)
+        return True
+
+    g = st.current_game
+    player = st.player
+    if g.status != "RUNNING":
+        send_raw(conn, _ERR_NOT_RUNNING)
+        return True
+
+    # Turn check.
+    if not g.players or g.players[g.turn_index].mark != player.mark:
+        send_raw(conn, _ERR_NOT_YOUR_TURN)
+        return True
+
+    r = int(msg.get("row"))
+    c = int(msg.get("col"))
+
+    if not (0 <= r < g.board_size and 0 <= c < g.board_size):
+        err(conn, "Out of bounds.", f"Use row/col in range 0..{g.board_size - 1}.")
+        return True
+    if g.cell(r, c) != " ":
+        send_raw(conn, _ERR_CELL_TAKEN)
+        return True
+
+    g.set_cell(r, c, player.mark)
+    g.empty_cells -= 1
+    g.invalidate_snapshot()
+
+    winner = check_winner_after_move(g.board, g.board_size, r, c)
+    if winner:
+        close_game_for_all(g, f"Winner: {winner}")
+    elif g.empty_cells == 0:
+        close_game_for_all(g, "Draw.")
+    else:
+        g.turn_index = (g.turn_index + 1) % len(g.players)
+        g.invalidate_snapshot()
+        dead = g.broadcast_bytes_collect_dead(encode_with_state({"type": "GAME_UPDATE"}, g.snapshot_json()))
+        handle_dead_conns_after_send(g, dead)
+
+    if g.status == "FINISHED" and len(g.players) == 0:
+        server_state.remove_game(g.game_id)
+    return True
+
+
+def handle_quit(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    send_raw(conn, _BYE)
+    return False
+
+
+def handle_bad_json(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    send_raw(conn, _ERR_BAD_JSON)
+    return True
+
+
+def handle_unknown(st: ClientState, conn: socket.socket, msg: dict) -> bool:
+    err(conn, f"Unknown type {msg.get('type')}", "Use LIST/CREATE/JOIN/MOVE/LEAVE/QUIT.")
+    return True
+
+
+# Message type -> handler. Each handler returns False when the connection should be closed.
+HANDLERS: Dict[str, Callable[[ClientState, socket.socket, dict], bool]] = {
+    "HELLO": handle_hello,
+    "LIST": handle_list,
+    "CREATE": handle_create,
+    "JOIN": handle_join,
+    "INFO": handle_info,
+    "LEAVE": handle_leave,
+    "MOVE": handle_move,
+    "QUIT": handle_quit,
+    "__BAD_JSON__": handle_bad_json,
+}
+
+
+def handle_message(st: ClientState, msg: dict) -> bool:
+    """Handle one client message. Returns False when the connection should be closed."""
+    mtype = msg.get("type")
+    # Only strings can be handler keys (a list "type" would not even be hashable).
+    handler = HANDLERS.get(mtype, handle_unknown) if isinstance(mtype, str) else handle_unknown
+    return handler(st, st.conn, msg)
+
+
+def client_disconnected(st: ClientState) -> None:
+    conn = st.conn
+
+    # If connection dies while in a game: close game for everyone (same semantics as LEAVE).
+    if st.current_game and st.player:
+        g = st.current_game
+        left_name = remove_player_from_game(g, conn) or "player"
+        if g.status in ("WAITING", "RUNNING") and len(g.players) >= 1:
+            close_game_for_all(g, f"Player {left_name} disconnected. Game ended.")
+        else:
+            g.status = "FINISHED"
+            g.invalidate_snapshot()
+        if len(g.players) == 0:
+            server_state.remove_game(g.game_id)
+        st.player = None
+
+    # Release name reservation.
+    if st.name_registered and st.client_name:
+        server_state.active_names.pop(st.client_name, None)
+
+    server_state.clients.pop(conn, None)
+    server_state.backlogged.pop(conn, None)
+
+    safe_close(conn)
+    server_state.log_disconnect(st.addr, st.client_name)
+
+
+# accept() errors that mean "out of resources": retrying right away would just fail again.
+_ACCEPT_EXHAUSTED = frozenset((errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM))
+
+
+def accept_clients(sel: selectors.BaseSelector, listener: socket.socket) -> bool:
+    """Accept every pending connection, not just one per selector wakeup.
+
+    Returns False when out of file descriptors: the caller should pause the listener,
+    which otherwise stays readable and spins the loop.
+    """
+    while True:
+        try:
+            conn, addr = listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return True
+        except ConnectionAbortedError:
+            # That connection was reset while queued; the next one may be fine.
+            continue
+        except OSError as e:
+            print(f"[ERROR] accept: {e!r}")
+            return e.errno not in _ACCEPT_EXHAUSTED
+        accept_client(sel, conn, addr)
+
+
+def accept_client(sel: selectors.BaseSelector, conn: socket.socket, addr: Tuple[str, int]) -> None:
     try:
-        send_json(conn, {"type": "WELCOME", "msg": "Connected to server."})
-
-        while True:
-            msg = recv_json(conn)
-            if msg is None:
-                break
-
-            mtype = msg.get("type")
-
-            if mtype == "HELLO":
-                if name_registered:
-                    err(conn, "Name already set.", "Continue in lobby (LIST/CREATE/JOIN) or QUIT.")
-                    continue
-
-                proposed = (msg.get("name") or "").strip()
-                if not proposed:
-                    err(conn, "Name cannot be empty.", "Enter a non-empty name.")
-                    continue
-
-                with server_state.names_lock:
-                    if proposed in server_state.active_names:
-                        err(conn, "Name already exists.", "Please choose a different name.")
-                        continue
-                    server_state.active_names.add(proposed)
-
-                client_name = proposed
-                name_registered = True
-                print(f"[NAME] {addr} -> {client_name}")
-                send_json(conn, {"type": "OK", "msg": f"Hello {client_name}."})
-
-            elif mtype == "LIST":
-                send_json(conn, {"type": "GAMES", "games": server_state.list_games()})
-
-            elif mtype == "CREATE":
-                if not name_registered or not client_name:
-                    err(conn, "You must set a unique name first.", "Send HELLO with your chosen name.")
-                    continue
-                if current_game is not None:
-                    err(conn, "Already in a game.", "Use LEAVE to return to lobby, then CREATE again.")
-                    continue
-
-                max_players = int(msg.get("players", 2))
-                if max_players not in (2, 3):
-                    err(conn, "Only 2 or 3 players supported.", "Use: CREATE 2  or  CREATE 3")
-                    continue
-
-                g = server_state.create_game(max_players, creator=client_name)
-                send_json(conn, {"type": "OK", "msg": "Game created.", "game_id": g.game_id})
-
-            elif mtype == "JOIN":
-                if not name_registered or not client_name:
-                    err(conn, "You must set a unique name first.", "Send HELLO with your chosen name.")
-                    continue
-                if current_game is not None:
-                    err(conn, "Already in a game.", "Use LEAVE to return to lobby, then JOIN another game.")
-                    continue
-
-                game_id = msg.get("game_id")
-                if not game_id:
-                    err(conn, "Missing game_id.", "Use JOIN <id> (Tip: use LIST).")
-                    continue
-
-                g = server_state.get_game(game_id)
-                if not g:
-                    err(conn, "Game not found.", "Use LIST to get a valid id.")
-                    continue
-
-                with g.lock:
-                    if g.status != "WAITING":
-                        err(conn, "Game already started/finished.", "Use LIST to find a WAITING game.")
-                        continue
-                    if len(g.players) >= g.max_players:
-                        err(conn, "Game is full.", "Use LIST and join another game.")
-                        continue
-
-                    # Assign mark by join order.
-                    mark = MARKS_BY_COUNT[g.max_players][len(g.players)]
-                    player = Player(conn=conn, name=client_name, mark=mark)
-                    g.players.append(player)
-                    current_game = g
-
-                    # IMPORTANT FLOW FIX:
-                    # If the game becomes full now, switch to RUNNING BEFORE sending state to clients.
-                    is_full = (len(g.players) == g.max_players)
-                    if is_full:
-                        g.status = "RUNNING"
-                        g.turn_index = 0
-
-                    snap = g.snapshot()
-
-                    send_json(
-                        conn,
-                        {
-                            "type": "JOINED",
-                            "msg": f"Joined game {g.game_id} as {mark}.",
-                            "you": {"name": client_name, "mark": mark},
-                            "state": snap,
-                        },
-                    )
-
-                    g.broadcast_except(
-                        {"type": "GAME_UPDATE", "msg": f"{client_name} joined as {mark}.", "state": snap},
-                        except_conn=conn,
-                    )
-
-                    if is_full:
-                        dead = g.broadcast_collect_dead({"type": "START", "msg": "Game started! X plays first.", "state": snap})
-                        handle_dead_conns_after_send(g, dead)
-                    else:
-                        dead = g.broadcast_collect_dead({"type": "WAIT", "msg": "Waiting for more players...", "state": snap})
-                        handle_dead_conns_after_send(g, dead)
-
-            elif mtype == "INFO":
-                send_json(conn, {"type": "OK", "msg": "Use client-side INFO for commands."})
-
-            elif mtype == "LEAVE":
-                if not current_game or not player:
-                    err(conn, "Not in a game.", "Use LIST/CREATE/JOIN first.")
-                    continue
-
-                g = current_game
-                with g.lock:
-                    left_name = remove_player_from_game(g, conn) or "player"
-
-                    # Requirement: leaving closes the game for everyone.
-                    if g.status in ("WAITING", "RUNNING") and len(g.players) >= 1:
-                        close_game_for_all(g, f"Player {left_name} left. Game ended.")
-                    else:
-                        g.status = "FINISHED"
-
-                if len(g.players) == 0:
-                    server_state.remove_game(g.game_id)
-
-                current_game = None
-                player = None
-                send_json(conn, {"type": "OK", "msg": "Left game. You can LIST/CREATE/JOIN again."})
-
-            elif mtype == "MOVE":
-                if not current_game or not player:
-                    err(conn, "Not in a game.", "JOIN a game first.")
-                    continue
-
-                g = current_game
-                with g.lock:
-                    if g.status != "RUNNING":
-                        err(conn, "Game not running.", "Wait for START or JOIN another game.")
-                        continue
-
-                    # Turn check.
-                    if not g.players or g.players[g.turn_index].mark != player.mark:
-                        err(conn, "Not your turn.", "Allowed while waiting: INFO or LEAVE (or QUIT).")
-                        continue
-
-                    r = int(msg.get("row"))
-                    c = int(msg.get("col"))
-
-                    if not (0 <= r < g.board_size and 0 <= c < g.board_size):
-                        err(conn, "Out of bounds.", f"Use row/col in range 0..{g.board_size - 1}.")
-                        continue
-                    if g.board[r][c] != " ":
-                        err(conn, "Cell is not empty.", "Choose a different empty cell.")
-                        continue
-
-                    g.board[r][c] = player.mark
-
-                    winner = check_winner_3_in_row(g.board)
-                    if winner:
-                        close_game_for_all(g, f"Winner: {winner}")
-                    elif board_full(g.board):
-                        close_game_for_all(g, "Draw.")
-                    else:
-                        g.turn_index = (g.turn_index + 1) % len(g.players)
-                        dead = g.broadcast_collect_dead({"type": "GAME_UPDATE", "state": g.snapshot()})
-                        handle_dead_conns_after_send(g, dead)
-
-                if g.status == "FINISHED" and len(g.players) == 0:
-                    server_state.remove_game(g.game_id)
-
-            elif mtype == "QUIT":
-                send_json(conn, {"type": "OK", "msg": "Bye"})
-                break
-
-            elif mtype == "__BAD_JSON__":
-                err(conn, "Bad message format (invalid JSON).", "Try again.")
-                continue
+        # Small ping-pong JSON lines: send immediately, and notice dead peers.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # One thread serves everyone: a send or recv must never wait on a single peer.
+        conn.setblocking(False)
+    except OSError as e:
+        # e.g. EINVAL on macOS when the peer already reset: drop just this connection.
+        print(f"[ERROR] setup {addr}: {e!r}")
+        safe_close(conn)
+        return
+    server_state.log_connect(addr)
+    st = ClientState(conn=conn, addr=addr, sel=sel)
+    server_state.clients[conn] = st
+    sel.register(conn, selectors.EVENT_READ, data=st)
+    try:
+        send_raw(conn, _WELCOME)
+    except OSError:
+        close_client(st)
+
+
+def close_client(st: ClientState) -> None:
+    if st.closed:
+        return
+    st.closed = True
+    st.sel.unregister(st.conn)
+    if st.tx_buf:
+        # Last chance for already-queued output (e.g. the reply to QUIT).
+        try:
+            st.conn.send(st.tx_buf)
+        except OSError:
+            pass
+    client_disconnected(st)
+
+
+def flush_client(st: ClientState) -> None:
+    """Called when st.conn is writable: send as much queued output as the socket takes."""
+    try:
+        sent = st.conn.send(st.tx_buf)
+    except BlockingIOError:
+        return
+    except OSError as e:
+        print(f"[ERROR] {st.addr} ({st.client_name}): {e!r}")
+        close_client(st)
+        return
+    del st.tx_buf[:sent]
+    if not st.tx_buf:
+        st.sel.modify(st.conn, selectors.EVENT_READ, st)
 
-            else:
-                err(conn, f"Unknown type {mtype}", "Use LIST/CREATE/JOIN/MOVE/LEAVE/QUIT.")
 
+def process_lines(st: ClientState) -> None:
+    """Handle up to MAX_LINES_PER_EVENT buffered lines; the rest waits for the next loop pass."""
+    try:
+        for line in take_lines(st.rx_buf, MAX_LINES_PER_EVENT):
+            if not handle_message(st, parse_json(line)):
+                close_client(st)
+                return
     except Exception as e:
-        print(f"[ERROR] {addr} ({client_name}): {e!r}")
-
-    finally:
-        # If connection dies while in a game: close game for everyone (same semantics as LEAVE).
-        if current_game and player:
-            g = current_game
-            with g.lock:
-                left_name = remove_player_from_game(g, conn) or "player"
-                if g.status in ("WAITING", "RUNNING") and len(g.players) >= 1:
-                    close_game_for_all(g, f"Player {left_name} disconnected. Game ended.")
-                else:
-                    g.status = "FINISHED"
-            if len(g.players) == 0:
-                server_state.remove_game(g.game_id)
-
-        # Release name reservation.
-        if name_registered and client_name:
-            with server_state.names_lock:
-                server_state.active_names.discard(client_name)
+        print(f"[ERROR] {st.addr} ({st.client_name}): {e!r}")
+        close_client(st)
+        return
 
-        safe_close(conn)
-        server_state.log_disconnect(addr, client_name)
+    if st.rx_buf.find(b"\n") >= 0:
+        server_state.backlogged[st.conn] = st
+    else:
+        server_state.backlogged.pop(st.conn, None)
+
+
+def serve_client(st: ClientState) -> None:
+    """Called when st.conn is readable: buffer its bytes and handle the complete lines."""
+    if st.conn in server_state.backlogged:
+        # Still working through lines already read; don't buffer more until they are done.
+        return
+    try:
+        chunk = st.conn.recv(RECV_SIZE)
+    except BlockingIOError:
+        return
+    except OSError as e:
+        print(f"[ERROR] {st.addr} ({st.client_name}): {e!r}")
+        close_client(st)
+        return
+    if not chunk:
+        close_client(st)
+        return
+    st.rx_buf.extend(chunk)
+    process_lines(st)
 
 
 def main() -> None:
@@ -487,13 +816,45 @@ def main() -> None:
         
     s.bind((HOST, PORT))
     s.listen()
+    s.setblocking(False)
     print(f"[LISTENING] on {HOST}:{PORT}")
 
+    # Single-threaded event loop: one selector for the listener and every client.
+    sel = selectors.DefaultSelector()
+    sel.register(s, selectors.EVENT_READ, data=None)
+
+    # While out of file descriptors the listener is unregistered until this monotonic time.
+    accept_paused_until: Optional[float] = None
+
     while True:
-        conn, addr = s.accept()
-        server_state.log_connect(addr)
-        t = threading.Thread(target=client_thread, args=(conn, addr), daemon=True)
-        t.start()
+        # Clients with lines left over from the last pass must not wait for new input.
+        pending = list(server_state.backlogged.values())
+        timeout: Optional[float] = 0 if pending else None
+        if accept_paused_until is not None:
+            wait = max(0.0, accept_paused_until - time.monotonic())
+            timeout = wait if timeout is None else min(timeout, wait)
+
+        events = sel.select(timeout)
+
+        if accept_paused_until is not None and time.monotonic() >= accept_paused_until:
+            sel.register(s, selectors.EVENT_READ, data=None)
+            accept_paused_until = None
+
+        for key, mask in events:
+            if key.data is None:
+                if not accept_clients(sel, s):
+                    sel.unregister(s)
+                    accept_paused_until = time.monotonic() + ACCEPT_BACKOFF
+                continue
+            st = key.data
+            if mask & selectors.EVENT_WRITE and not st.closed:
+                flush_client(st)
+            if mask & selectors.EVENT_READ and not st.closed:
+                serve_client(st)
+
+        for st in pending:
+            if not st.closed:
+                process_lines(st)
 
 
 if __name__ == "__main__":